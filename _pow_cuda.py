@@ -0,0 +1,71 @@
+"""
+CUDA nonce search for Blockchain.proof_of_work, running pow_kernel.cu
+through CuPy.
+
+Importing this module raises ImportError without CuPy or a CUDA device,
+so blockchain.py can treat it like any other optional backend.
+"""
+
+import os
+
+import cupy
+import numpy as np
+
+try:
+    _devices = cupy.cuda.runtime.getDeviceCount()
+except cupy.cuda.runtime.CUDARuntimeError:
+    _devices = 0
+
+if not _devices:
+    raise ImportError("No CUDA device available.")
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pow_kernel.cu')) as f:
+    _module = cupy.RawModule(code=f.read())
+
+_midstate = _module.get_function('midstate')
+_search = _module.get_function('search')
+
+# Proofs tried per launch, and threads per CUDA block.
+WINDOW = 1 << 24
+_THREADS = 256
+
+_NOT_FOUND = np.iinfo(np.uint64).max
+
+
+def midstate(prefix):
+    """
+    SHA-256 state after the whole 64-byte blocks of prefix, on the device.
+
+    Items of interest:
+        prefix - (bytes)      - str(last_proof).encode().
+        return - (cupy.array) - 8 uint32 words.
+    """
+    state = cupy.empty(8, dtype=cupy.uint32)
+    _midstate((1,), (1,), (cupy.asarray(np.frombuffer(prefix, dtype=np.uint8)), np.uint64(len(prefix)), state))
+
+    return state
+
+
+def find_proof(prefix, midstate, start, stop, target, mask):
+    """
+    Searches [start, stop) for the smallest valid proof, one thread per proof.
+
+    Items of interest:
+        prefix   - (bytes)      - str(last_proof).encode().
+        midstate - (cupy.array) - midstate(prefix).
+        target   - (int)        - Leading digest word a proof must have,
+        mask     - (int)        - under this mask.
+        return   - (int)        - The proof, or -1 if none is in range.
+    """
+    count = stop - start
+    out = cupy.full(1, _NOT_FOUND, dtype=cupy.uint64)
+
+    _search(((count + _THREADS - 1) // _THREADS,), (_THREADS,), (
+        midstate, cupy.asarray(np.frombuffer(prefix, dtype=np.uint8)), np.uint64(len(prefix)),
+        np.uint64(start), np.uint64(count), np.uint32(target), np.uint32(mask), out,
+    ))
+
+    # Reading the result waits for the launch to finish.
+    proof = int(out[0])
+
+    return -1 if proof == _NOT_FOUND else proof
@@ -0,0 +1,201 @@
+"""
+Numba nonce search for Blockchain.proof_of_work.
+
+Used when the sha256ni C library is not built. SHA-256 is written out
+against int64 arrays (each word kept below 2**32) so the search loop,
+the decimal formatting and the prefix check all compile to machine code.
+"""
+
+import numpy as np
+
+from numba import get_num_threads, njit, prange
+
+_K = np.array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+], dtype=np.int64)
+
+_H0 = np.array([
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19,
+], dtype=np.int64)
+
+_MASK = 0xFFFFFFFF
+
+# find_proof splits its range into chunks of this many proofs, one per
+# thread, searched in parallel.
+_CHUNK = 1 << 13
+
+# Proofs a chunk tries between checks for a hit in an earlier chunk.
+_CHECK_EVERY = 1024
+
+
+def __getattr__(name):
+    # Proofs tried per find_proof call: a chunk for each thread. A proof
+    # turns up about every 65536 tries, so a bigger window mostly hashes
+    # proofs past the one found. Worked out on first use, not at import:
+    # asking for the thread count starts Numba's threads, which must not
+    # happen in a process that forks afterwards (e.g. gunicorn's master).
+    global WINDOW
+    if name == 'WINDOW':
+        WINDOW = _CHUNK * get_num_threads()
+        return WINDOW
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@njit(cache=True)
+def _rotr(x, n):
+    return ((x >> n) | (x << (32 - n))) & _MASK
+
+
+@njit(cache=True)
+def sha256_compress(state, block, offset, w):
+    """
+    Compresses one 64-byte block into state, in place.
+
+    Items of interest:
+        state  - (int64[8])
+        block  - (uint8[])  - Buffer holding the block.
+        offset - (int)      - Where the block starts in the buffer.
+        w      - (int64[64]) - Scratch for the message schedule, owned by
+                               the caller so the search loop never allocates.
+        return - (None)
+    """
+    for i in range(16):
+        j = offset + 4 * i
+        w[i] = (np.int64(block[j]) << 24) | (np.int64(block[j + 1]) << 16) \
+            | (np.int64(block[j + 2]) << 8) | np.int64(block[j + 3])
+    for i in range(16, 64):
+        s0 = _rotr(w[i - 15], 7) ^ _rotr(w[i - 15], 18) ^ (w[i - 15] >> 3)
+        s1 = _rotr(w[i - 2], 17) ^ _rotr(w[i - 2], 19) ^ (w[i - 2] >> 10)
+        w[i] = (w[i - 16] + s0 + w[i - 7] + s1) & _MASK
+
+    a, b, c, d, e, f, g, h = state[0], state[1], state[2], state[3], state[4], state[5], state[6], state[7]
+    for i in range(64):
+        t1 = (h + (_rotr(e, 6) ^ _rotr(e, 11) ^ _rotr(e, 25)) + (g ^ (e & (f ^ g))) + _K[i] + w[i]) & _MASK
+        t2 = ((_rotr(a, 2) ^ _rotr(a, 13) ^ _rotr(a, 22)) + ((a & b) | (c & (a | b)))) & _MASK
+        h, g, f, e = g, f, e, (d + t1) & _MASK
+        d, c, b, a = c, b, a, (t1 + t2) & _MASK
+
+    state[0] = (state[0] + a) & _MASK
+    state[1] = (state[1] + b) & _MASK
+    state[2] = (state[2] + c) & _MASK
+    state[3] = (state[3] + d) & _MASK
+    state[4] = (state[4] + e) & _MASK
+    state[5] = (state[5] + f) & _MASK
+    state[6] = (state[6] + g) & _MASK
+    state[7] = (state[7] + h) & _MASK
+
+
+@njit(cache=True)
+def midstate(prefix):
+    """
+    SHA-256 state after the whole 64-byte blocks of prefix.
+
+    Items of interest:
+        prefix - (bytes) - str(last_proof).encode().
+        return - (int64[8])
+    """
+    state = _H0.copy()
+    w = np.empty(64, np.int64)
+    for offset in range(0, len(prefix) - len(prefix) % 64, 64):
+        sha256_compress(state, prefix, offset, w)
+
+    return state
+
+
+@njit(cache=True)
+def _as_array(prefix):
+    # Parallel loops only take arrays, not bytes.
+    data = np.empty(len(prefix), np.uint8)
+    for i in range(len(prefix)):
+        data[i] = prefix[i]
+
+    return data
+
+
+@njit(cache=True)
+def _first_proof(prefix, midstate, start, stop, target, mask, hits, chunk):
+    # Stops early, returning -1, once an earlier chunk has a hit: anything
+    # found here would be larger.
+    absorbed = len(prefix) - len(prefix) % 64
+    tail_len = len(prefix) - absorbed
+    buf = np.zeros(128, np.uint8)
+    digits = np.empty(20, np.uint8)
+    state = np.empty(8, np.int64)
+    w = np.empty(64, np.int64)
+
+    for i in range(tail_len):
+        buf[i] = prefix[absorbed + i]
+
+    for proof in range(start, stop):
+        if (proof - start) % _CHECK_EVERY == 0:
+            for c in range(chunk):
+                if hits[c] >= 0:
+                    return -1
+
+        n, count = proof, 0
+        while True:
+            digits[count] = 48 + n % 10
+            count += 1
+            n //= 10
+            if n == 0:
+                break
+        for i in range(count):
+            buf[tail_len + i] = digits[count - 1 - i]
+
+        length = tail_len + count
+        end = 64 if length + 9 <= 64 else 128
+        buf[length] = 0x80
+        for i in range(length + 1, end - 8):
+            buf[i] = 0
+        bits = (absorbed + length) * 8
+        for i in range(8):
+            buf[end - 1 - i] = (bits >> (8 * i)) & 0xFF
+
+        state[:] = midstate
+        sha256_compress(state, buf, 0, w)
+        if end == 128:
+            sha256_compress(state, buf, 64, w)
+
+        if (state[0] & mask) == target:
+            return proof
+
+    return -1
+
+
+@njit(parallel=True, cache=True)
+def find_proof(prefix, midstate, start, stop, target, mask):
+    """
+    Searches [start, stop) for the smallest valid proof. The range is cut
+    into contiguous chunks searched in parallel, each stopping at its
+    first hit or once an earlier chunk has one.
+
+    Items of interest:
+        prefix   - (bytes)     - str(last_proof).encode().
+        midstate - (int64[8])  - midstate(prefix).
+        target   - (int)       - Leading digest word a proof must have,
+        mask     - (int)       - under this mask.
+        return   - (int)       - The proof, or -1 if none is in range.
+    """
+    chunks = (stop - start + _CHUNK - 1) // _CHUNK
+    hits = np.full(chunks, -1, np.int64)
+
+    data = _as_array(prefix)
+
+    for c in prange(chunks):
+        lo = start + c * _CHUNK
+        hits[c] = _first_proof(data, midstate, lo, min(lo + _CHUNK, stop), target, mask, hits, c)
+
+    # Chunks are in search order, so the first hit is the smallest.
+    for c in range(chunks):
+        if hits[c] >= 0:
+            return hits[c]
+
+    return -1
@@ -1,20 +1,243 @@
+import array
+import ctypes
 import hashlib
-import json
+import logging
+import multiprocessing
+import orjson
+import os
+import re
 import requests
+import threading
 
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
 from textwrap import dedent
 from time import time
-from urllib.prase import urlparse
+from urllib.parse import urlparse
 from uuid import uuid4
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
+from requests.adapters import HTTPAdapter
+
+
+def _load_library():
+    """
+    Loads the nonce searches built from sha256ni.c.
+
+    Items of interest:
+        return - (Optional, ctypes.CDLL) - None if the library was not built.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sha256ni.so')
+
+    try:
+        return ctypes.CDLL(path)
+    except OSError:
+        return None
+
+def _prefix_match_function(prefix_match):
+    # Every backend in sha256ni.c shares this signature.
+    prefix_match.restype = ctypes.c_int64
+    prefix_match.argtypes = [
+        ctypes.c_char_p, ctypes.c_size_t,
+        ctypes.c_uint64, ctypes.c_uint64, ctypes.c_uint64,
+        ctypes.c_uint32, ctypes.c_uint32,
+    ]
+
+    return prefix_match
+
+def _select_backend():
+    """
+    Picks the nonce search proof_of_work uses once, at import, checking
+    the CPU's features the way Bitcoin Core picks its SHA256 implementation.
+    Fastest first: SHA-NI, AVX2, CUDA, Numba, then hashlib. Numba goes
+    ahead of hashlib, and of the worker pool, as it hashes about 1.5x
+    faster per core and spreads each window over its own threads, which
+    the pool would do with processes. The CUDA and Numba modules are only
+    imported once the C backends are ruled out, as importing _pow_cuda
+    compiles its kernel.
+
+    Items of interest:
+        return - (tuple) - (name, prefix_match, device):
+                           name         - (str) - Logged at startup.
+                           prefix_match - (Optional, function) - C search run
+                                          by _search_proofs, None for hashlib.
+                           device       - (Optional, module) - _pow_cuda or
+                                          _pow_numba, searching whole windows.
+    """
+    lib = _library
+
+    if lib is not None and lib.sha256ni_supported():
+        return 'shani(2way)', _prefix_match_function(lib.sha256ni_prefix_match), None
+    if lib is not None and lib.avx2_supported():
+        return 'avx2(8way)', _prefix_match_function(lib.avx2_prefix_match), None
+
+    # Beyond a missing CuPy or device, building the kernel can fail with
+    # CuPy's own errors, which must not stop blockchain.py from importing.
+    try:
+        import _pow_cuda
+    except ImportError:
+        pass
+    except Exception:
+        logging.getLogger(__name__).warning("CUDA backend unavailable", exc_info=True)
+    else:
+        return 'cuda', None, _pow_cuda
+
+    try:
+        import _pow_numba
+    except ImportError:
+        pass
+    else:
+        return 'numba', None, _pow_numba
+
+    return 'hashlib', None, None
+
+def _load_check_links():
+    """
+    Loads the batched chain link check valid_chain uses on SHA-NI CPUs.
+
+    Items of interest:
+        return - (Optional, function) - None if the library was not built
+                                        or SHA-NI is not supported.
+    """
+    if _library is None or not _library.sha256ni_supported():
+        return None
+
+    check_links = _library.sha256ni_check_links
+    check_links.restype = ctypes.c_int64
+    check_links.argtypes = [
+        ctypes.c_char_p, ctypes.POINTER(ctypes.c_uint64), ctypes.c_size_t,
+        ctypes.c_char_p, ctypes.POINTER(ctypes.c_uint64),
+        ctypes.c_uint32, ctypes.c_uint32,
+    ]
+
+    return check_links
+
+_library = _load_library()
+
+sha256_implementation, _prefix_match, _pow_device = _select_backend()
+
+_check_links = _load_check_links()
+
+# One device search at a time: the GPU is shared, and Numba's workqueue
+# threading layer aborts if parallel code is entered from two threads.
+_pow_device_lock = threading.Lock()
+
+# Proofs searched between checks for a result from another worker.
+_POW_WINDOW = 4096
+
+# A valid proof's digest leads with bytes 0x12 0x34, i.e. hex "1234": its
+# first big-endian word, masked, equals the target. The C, Numba and CUDA
+# searches take these.
+_POW_TARGET = 0x12340000
+_POW_MASK = 0xffff0000
+
+# The same test as the two digest bytes the mask covers, for valid_proof
+# and the hashlib search: comparing them skips building an int from the
+# digest.
+_POW_BYTE0 = _POW_TARGET >> 24
+_POW_BYTE1 = _POW_TARGET >> 16 & 0xff
+
+def _search_proofs(prefix, start, stride, count):
+    """
+    Searches the count proofs start, start + stride, ... on the CPU.
+
+    Items of interest:
+        prefix - (bytes) - str(last_proof).encode()
+        return - (int)   - First valid proof, or -1 if none is in range.
+    """
+    if _prefix_match is not None:
+        return _prefix_match(prefix, len(prefix), start, stride, count, _POW_TARGET, _POW_MASK)
+
+    # Hash the last proof once, then only the proof for each guess.
+    midstate = hashlib.sha256(prefix)
+    for proof in range(start, start + stride * count, stride):
+        guess = midstate.copy()
+        guess.update(b'%d' % proof)
+        digest = guess.digest()
+        if digest[0] == _POW_BYTE0 and digest[1] == _POW_BYTE1:
+            return proof
+
+    return -1
+
+# Characters a plain node URL never holds: whitespace, control or
+# non-ASCII characters (urlparse strips or checks those), "?", "#" and
+# IPv6 brackets.
+_NOT_PLAIN = r'\x00-\x20\x7f-\U0010ffff?#\[\]'
+
+# "scheme://netloc/..." that urlparse would split the same way.
+_PLAIN_NODE_URL = re.compile(
+    r'[A-Za-z][A-Za-z0-9+.-]*://'   # A bare scheme,
+    rf'([^{_NOT_PLAIN}/]*)'         # the netloc, up to the first "/",
+    rf'[^{_NOT_PLAIN}]*'            # and the path.
+)
+
+# Most neighbours resolve_conflicts fetches a chain from at once.
+_MAX_PEER_FETCHES = 32
+
+# Seconds to wait on a neighbour before leaving it out of a round.
+_PEER_TIMEOUT = 2
+
+# Shared by every consensus round, so connections to neighbours stay open.
+_session = requests.Session()
+_session.mount('http://', HTTPAdapter(pool_connections=64, pool_maxsize=64, max_retries=1))
+
+# Shared with every pool worker, see Blockchain.pool_proof_of_work.
+_pow_found = None
+_pow_best = None
+
+def _init_pow_worker(found, best):
+    global _pow_found, _pow_best
+    _pow_found = found
+    _pow_best = best
+
+def _pow_worker(prefix, start, stride):
+    """
+    One worker's share of a pooled proof of work. Stops at its first hit,
+    or once another worker holds a proof smaller than any left to try here.
+    """
+    proof = start
+    while True:
+        hit = _search_proofs(prefix, proof, stride, _POW_WINDOW)
+        if hit >= 0:
+            with _pow_best.get_lock():
+                if _pow_best.value < 0 or hit < _pow_best.value:
+                    _pow_best.value = hit
+            _pow_found.set()
+            return
+
+        proof += stride * _POW_WINDOW
+        if _pow_found.is_set() and proof > _pow_best.value:
+            return
 
 class Blockchain(object):
-    def __init__(self):
-        self.chain = []
-        self.current_transactions = []
+    def __init__(self, workers=None):
+        # Each block stored as the sorted-key JSON that hash() digests.
+        self.chain_bytes = []
         self.nodes = set()
 
+        # Guards chain_bytes, nodes and pending transactions across the threads
+        # of a threaded server.
+        self.lock = threading.RLock()
+
+        # Pending transactions, one column per field.
+        self._senders = []
+        self._recipients = []
+        self._amounts = []
+
+        # Hash of the last block, kept by new_block and resolve_conflicts.
+        self._tip_hash = None
+
+        # Serialized blocks of the last chain valid_chain accepted. Ours is
+        # valid by construction, and stays so as blocks are mined onto it.
+        self._validated_chain = self.chain_bytes
+
+        # Processes used by proof_of_work, started on first use.
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._found = None
+        self._best = None
+
         self.new_block(previous_hash=1, proof=100)
 
     def new_block(self, proof, previous_hash=None):
@@ -27,20 +250,26 @@ class Blockchain(object):
             return        - (dict) - The new block.
         """
         
-        block = {
-            'index': len(self.chain) + 1,
-            'timestamp': time(),
-            'transactions': self.current_transactions,
-            'proof': proof,
-            'previous_hash': previous_hash or self.hash(self.chain[-1]),
-        }
-
-        # Wipe list of transactions.
-        self.current_transactions = []
-
-        self.chain.append(block)
-
-        return block
+        with self.lock:
+            # Keys in sorted order, as hash() serializes them.
+            block = {
+                'index': len(self.chain_bytes) + 1,
+                'previous_hash': previous_hash or self._tip_hash,
+                'proof': proof,
+                'timestamp': time(),
+                'transactions': self.current_transactions,
+            }
+
+            # Wipe list of transactions.
+            self._senders = []
+            self._recipients = []
+            self._amounts = []
+
+            block_bytes = orjson.dumps(block, option=orjson.OPT_SORT_KEYS)
+            self.chain_bytes.append(block_bytes)
+            self._tip_hash = hashlib.sha256(block_bytes).hexdigest()
+
+            return block
 
     def new_transaction(self, sender, recipient, amount):
         """
@@ -53,28 +282,68 @@ class Blockchain(object):
             return    - (int) - Index of the Block that holds the transaction.
         """
         
-        self.current_transactions.append({
-            'sender': sender,
-            'recipient': recipient,
-            'amount': amount,
-        })
+        with self.lock:
+            self._senders.append(sender)
+            self._recipients.append(recipient)
+            self._amounts.append(amount)
 
-        return self.last_block['index'] + 1
+            return len(self.chain_bytes) + 1
+
+    @property
+    def current_transactions(self):
+        """
+        Pending transactions as a new list of dicts, in the form a block
+        stores them.
+
+        Items of interest:
+            return - (list)
+        """
+        # Keys in sorted order, as hash() serializes them.
+        with self.lock:
+            return [
+                {'amount': amount, 'recipient': recipient, 'sender': sender}
+                for sender, recipient, amount in zip(self._senders, self._recipients, self._amounts)
+            ]
 
     @staticmethod
     def hash(block):
         """
         SHA-256 hash of given block.
 
+        Blocks must be serializable by orjson, so ints must fit in 64 bits.
+        Any other block raises orjson.JSONEncodeError (a TypeError): it has
+        no hash, and so can never be part of a valid chain.
+
         Items of interest:
             block  - (dict) - Block to be hashed.
             return - (str)  - The hash itself.
         """
         # Orders dictionary to prevent inconsistent hashes.
-        block_string = json.dumps(block, sort_keys=True).encode()
+        block_string = orjson.dumps(block, option=orjson.OPT_SORT_KEYS)
 
         return hashlib.sha256(block_string).hexdigest()
 
+    @property
+    def tip_hash(self):
+        """
+        Hash of the last block, which the next block points back to.
+
+        Items of interest:
+            return - (str)
+        """
+        return self._tip_hash
+
+    @property
+    def chain(self):
+        """
+        The blocks, decoded from chain_bytes into new dicts.
+
+        Items of interest:
+            return - (list)
+        """
+        with self.lock:
+            return [orjson.loads(block_bytes) for block_bytes in self.chain_bytes]
+
     @property
     def last_block(self):
         """
@@ -83,7 +352,7 @@ class Blockchain(object):
         Items of interest:
             return - (dict) - The block.
         """
-        return self.chain[-1]
+        return orjson.loads(self.chain_bytes[-1])
 
     def proof_of_work(self, last_proof):
         """
@@ -98,11 +367,62 @@ class Blockchain(object):
             return     - (int)
         """
 
-        proof = 0
-        while self.valid_proof(last_proof, proof) is False:
-            proof += 1
+        prefix = str(last_proof).encode()
+
+        # CUDA and Numba spread each window over many threads themselves.
+        if _pow_device is not None:
+            with _pow_device_lock:
+                midstate = _pow_device.midstate(prefix)
+                start = 0
+                while True:
+                    proof = _pow_device.find_proof(
+                        prefix, midstate, start, start + _pow_device.WINDOW, _POW_TARGET, _POW_MASK)
+                    if proof >= 0:
+                        break
+                    start += _pow_device.WINDOW
+
+            # A device proof is only used once the CPU agrees it is valid.
+            if self.valid_proof(last_proof, proof):
+                return proof
+            logging.getLogger(__name__).warning(
+                "%s returned invalid proof %d, searching on the CPU", sha256_implementation, proof)
+
+        if self.workers > 1:
+            return self.pool_proof_of_work(prefix)
+
+        start = 0
+        while True:
+            proof = _search_proofs(prefix, start, 1, _POW_WINDOW)
+            if proof >= 0:
+                return proof
+            start += _POW_WINDOW
+
+    def pool_proof_of_work(self, prefix):
+        """
+        Proof of work split over self.workers processes, worker k trying
+        proofs k, k + workers, k + 2 * workers, ...
+
+        Items of interest:
+            prefix - (bytes) - str(last_proof).encode()
+            return - (int)   - Smallest valid proof, as a serial search finds.
+        """
 
-        return proof
+        # One search at a time: workers share a single found/best pair.
+        with self._pool_lock:
+            if self._pool is None:
+                self._found = multiprocessing.Event()
+                self._best = multiprocessing.Value('q', -1)
+                self._pool = multiprocessing.Pool(
+                    self.workers,
+                    initializer=_init_pow_worker,
+                    initargs=(self._found, self._best),
+                )
+
+            self._found.clear()
+            self._best.value = -1
+            self._pool.starmap(_pow_worker, [(prefix, k, self.workers) for k in range(self.workers)])
+
+            return self._best.value
 
     @staticmethod
     def valid_proof(last_proof, proof):
@@ -115,9 +435,15 @@ class Blockchain(object):
             return     - (bool)
         """
 
-        guess = f'{last_proof}{proof}'.encode()
-        guess_hash = hashlib.sha256(guess).hexdigest()
-        return guess_hash[:4] == "1234"
+        # Proofs from a peer can be anything JSON holds. Only plain ints
+        # take the bytes formatting: '%d' would truncate a float and
+        # reject a str, where the f-string hashes them as written.
+        if type(last_proof) is int and type(proof) is int:
+            guess = b'%d%d' % (last_proof, proof)
+        else:
+            guess = f'{last_proof}{proof}'.encode()
+        guess_hash = hashlib.sha256(guess).digest()
+        return guess_hash[0] == _POW_BYTE0 and guess_hash[1] == _POW_BYTE1
     
     def register_node(self, address):
         """
@@ -128,8 +454,13 @@ class Blockchain(object):
             return  - (None)
         """
 
-        parsed_url = urlparse(address)
-        self.nodes.add(parsed_url.netloc)
+        # "http://host:port/..." is by far the usual form: take what sits
+        # between "://" and the path without a full parse.
+        match = _PLAIN_NODE_URL.fullmatch(address)
+        netloc = match.group(1) if match else urlparse(address).netloc
+
+        with self.lock:
+            self.nodes.add(netloc)
 
     def valid_chain(self, chain):
         """
@@ -140,19 +471,88 @@ class Blockchain(object):
             return - (bool) - Validity of blockchain.
         """
 
-        last_block = chain[0]
-        current_index = 1
+        return self._validate(chain) is not None
+
+    def _validate(self, chain):
+        """
+        valid_chain, handing back the serialized blocks instead of True so a
+        chain can be adopted without serializing it again.
+
+        Items of interest:
+            chain  - (list)           - Blockchain.
+            return - (Optional, list) - Blocks as hash() serializes them,
+                                        None if chain is invalid.
+        """
+
+        # A block orjson cannot serialize (e.g. an int past 64 bits) has no
+        # hash, see hash(). A chain from a peer may also be empty, or not
+        # a list of blocks at all: a missing block or field, or one of the
+        # wrong type, makes it invalid too.
+        try:
+            chain_bytes = [orjson.dumps(block, option=orjson.OPT_SORT_KEYS) for block in chain]
+
+            # Blocks byte-for-byte equal to those of the last chain found
+            # valid are not checked again.
+            validated = self._validated_chain
+            shared = 0
+            while shared < min(len(chain_bytes), len(validated)) and chain_bytes[shared] == validated[shared]:
+                shared += 1
+
+            if not self._valid_links(chain, chain_bytes, max(shared, 1)):
+                return None
+        except (IndexError, KeyError, TypeError):
+            return None
+
+        self._validated_chain = chain_bytes
+
+        return chain_bytes
+
+    def _valid_links(self, chain, chain_bytes, current_index):
+        """
+        Checks the previous_hash and proof of every block from current_index
+        on. Done in one call to the library where it can be, block by block
+        otherwise.
+
+        Items of interest:
+            chain         - (list) - Blockchain.
+            chain_bytes   - (list) - Its blocks, as hash() serializes them.
+            current_index - (int)  - First block to check, at least 1.
+            return        - (bool)
+        """
+
+        if _check_links is not None and current_index < len(chain):
+            hashes = [block['previous_hash'] for block in chain[current_index:]]
+            proofs = [block['proof'] for block in chain[current_index - 1:]]
+
+            # Only plain ints within uint64 and 64-character ASCII hashes go
+            # to C. Anything else (negative proofs, floats, strs, bools, odd
+            # hashes) is left to the per-block loop below, where valid_proof
+            # and the hash comparison judge it.
+            if set(map(type, proofs)) == {int} and min(proofs) >= 0 and max(proofs) < 1 << 64 \
+                    and set(map(type, hashes)) == {str} and set(map(len, hashes)) == {64} \
+                    and all(map(str.isascii, hashes)):
+                proofs = array.array('Q', proofs)
+                linked = chain_bytes[current_index - 1:-1]
+                ends = array.array('Q', accumulate(map(len, linked)))
+
+                return _check_links(
+                    b''.join(linked), (ctypes.c_uint64 * len(ends)).from_buffer(ends), len(ends),
+                    ''.join(hashes).encode(), (ctypes.c_uint64 * len(proofs)).from_buffer(proofs),
+                    _POW_TARGET, _POW_MASK,
+                ) < 0
+
+        last_hash = hashlib.sha256(chain_bytes[current_index - 1]).hexdigest()
 
         while current_index < len(chain):
             block = chain[current_index]
 
-            if block['previous_hash'] != self.hash(last_block):
+            if block['previous_hash'] != last_hash:
                 return False
-            
-            if not self.valid_proof(last_block['proof'], block['proof']):
+
+            if not self.valid_proof(chain[current_index - 1]['proof'], block['proof']):
                 return False
 
-            last_block = block
+            last_hash = hashlib.sha256(chain_bytes[current_index]).hexdigest()
             current_index += 1
 
         return True
@@ -166,25 +566,50 @@ class Blockchain(object):
             return - (bool) - If chain was replaced successfully.
         """
 
-        neighbours = self.nodes
-        new_chain = None
-
-        max_length = len(self.chain)
-
-        for node in neighbours:
-            response = requests.get(f"http://{node}/chain")
+        with self.lock:
+            neighbours = list(self.nodes)
+            max_length = len(self.chain_bytes)
+
+        def fetch(node):
+            try:
+                return _session.get(f"http://{node}/chain", timeout=_PEER_TIMEOUT)
+            except requests.RequestException:
+                # Down or too slow; it sits this round out.
+                return None
+
+        # Fetch every neighbour's chain at once; one slow node no longer
+        # holds up the rest.
+        with ThreadPoolExecutor(max(1, min(len(neighbours), _MAX_PEER_FETCHES))) as executor:
+            responses = list(executor.map(fetch, neighbours))
+
+        candidates = []
+        for response in responses:
+            if response is not None and response.status_code == 200:
+                # A body that is not JSON, or lacks a chain, leaves that
+                # neighbour out like one that is down.
+                try:
+                    chain = response.json()['chain']
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+                # Chains are measured by their blocks, not by the length
+                # a neighbour reports.
+                if isinstance(chain, list) and len(chain) > max_length:
+                    candidates.append(chain)
+
+        # Longest first, so the first valid chain is the one to keep.
+        candidates.sort(key=len, reverse=True)
+        with self.lock:
+            for chain in candidates:
+                # Blocks mined while fetching may have made ours as long.
+                if len(chain) <= len(self.chain_bytes):
+                    break
+                chain_bytes = self._validate(chain)
+                if chain_bytes is not None:
+                    self.chain_bytes = chain_bytes
+                    self._tip_hash = hashlib.sha256(chain_bytes[-1]).hexdigest()
+                    return True
 
-            if response.status_code == 200:
-                length = response.json()['length']
-                chain = response.json()['chain']
-
-                if length > max_length and self.valid_chain(chain):
-                    max_length = length
-                    new_chain = chain
-        if new_chain:
-            self.chain = new_chain
-            return True
-        
         return False
 
 
@@ -195,18 +620,25 @@ blockchain = Blockchain()
 
 @app.route('/mine', methods=['GET'])
 def mine():
-    last_block = blockchain.last_block
-    last_proof = last_block['proof']
-    proof = blockchain.proof_of_work(last_proof)
-
-    blockchain.new_transaction(
-        sender = "0",
-        recipient = node_identifier,
-        amount = 1,
-    )
-
-    previous_hash = blockchain.hash(last_block)
-    block = blockchain.new_block(proof, previous_hash)
+    while True:
+        with blockchain.lock:
+            last_proof = blockchain.last_block['proof']
+            last_hash = blockchain.tip_hash
+        proof = blockchain.proof_of_work(last_proof)
+
+        with blockchain.lock:
+            # Another request may have added a block while we mined.
+            if blockchain.tip_hash != last_hash:
+                continue
+
+            blockchain.new_transaction(
+                sender = "0",
+                recipient = node_identifier,
+                amount = 1,
+            )
+
+            block = blockchain.new_block(proof)
+            break
 
     response = {
         'message':       "New block forged.",
@@ -225,6 +657,13 @@ def new_transaction():
     required = ['sender', 'recipient', 'amount']
     if not all(k in values for k in required):
         return "Missing values in this new transaction POST.", 400
+
+    # Blocks are serialized with orjson, which rejects ints past 64 bits;
+    # one in a pending transaction would make every /mine fail.
+    try:
+        orjson.dumps([values[k] for k in required])
+    except orjson.JSONEncodeError:
+        return "Values in this new transaction POST must fit in 64-bit integers.", 400
     
     index = blockchain.new_transaction(values['sender'], values['recipient'], values['amount'])
     
@@ -236,12 +675,14 @@ def new_transaction():
 
 @app.route('/chain', methods=['GET'])
 def full_chain():
-    response = {
-        'chain': blockchain.chain,
-        'length': len(blockchain.chain),
-    }
+    with blockchain.lock:
+        chain_bytes = list(blockchain.chain_bytes)
 
-    return jsonify(response), 200
+    # Blocks are kept as JSON already, so splice them in without decoding:
+    # {"chain": [...], "length": n}
+    response = b'{"chain":[' + b','.join(chain_bytes) + b'],"length":%d}' % len(chain_bytes)
+
+    return Response(response, mimetype='application/json'), 200
 
 @app.route('/nodes/register', methods=['POST'])
 def register_nodes():
@@ -254,9 +695,12 @@ def register_nodes():
     for node in nodes:
         blockchain.register_node(node)
 
+    with blockchain.lock:
+        total_nodes = list(blockchain.nodes)
+
     response = {
         'message': "New nodes have been added.",
-        'total_nodes': list(blockchain.nodes),
+        'total_nodes': total_nodes,
     }
 
     return jsonify(response), 201
@@ -265,18 +709,24 @@ def register_nodes():
 def consensus():
     replaced = blockchain.resolve_conflicts()
 
+    chain = blockchain.chain
+
     if replaced:
         response = {
             'message': "Our chain was replaced.",
-            'new_chain': blockchain.chain,
+            'new_chain': chain,
         }
     else:
         response = {
             'message': "Our chain is authoritative.",
-            'chain': blockchain.chain,
+            'chain': chain,
         }
 
     return jsonify(response), 200
 
 if __name__ == '__main__':
-    app.run(host = '127.0.0.1', port = 5000)
+    logging.basicConfig(level=logging.INFO)
+    app.logger.info("Using SHA256 implementation: %s", sha256_implementation)
+
+    # Development server; see wsgi.py for running under gunicorn.
+    app.run(host = '127.0.0.1', port = 5000, threaded = True)
@@ -0,0 +1,122 @@
+/*
+ * CUDA nonce search for Blockchain.proof_of_work, compiled at runtime by
+ * _pow_cuda.py through cupy.RawModule.
+ *
+ * midstate: one thread compresses the whole 64-byte blocks of the prefix.
+ * search:   each thread hashes tail || str(start + thread index) from that
+ *           midstate and atomicMin()s its proof into *out on a match.
+ */
+
+__constant__ unsigned int K[64] = {
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+};
+
+__device__ __forceinline__ unsigned int rotr(unsigned int x, int n)
+{
+    return (x >> n) | (x << (32 - n));
+}
+
+__device__ void compress(unsigned int state[8], const unsigned char *block)
+{
+    unsigned int w[64], s[8], t1, t2;
+
+#pragma unroll
+    for (int i = 0; i < 16; i++)
+        w[i] = ((unsigned int)block[4 * i] << 24) | ((unsigned int)block[4 * i + 1] << 16)
+             | ((unsigned int)block[4 * i + 2] << 8) | block[4 * i + 3];
+#pragma unroll
+    for (int i = 16; i < 64; i++)
+        w[i] = w[i - 16] + (rotr(w[i - 15], 7) ^ rotr(w[i - 15], 18) ^ (w[i - 15] >> 3))
+             + w[i - 7] + (rotr(w[i - 2], 17) ^ rotr(w[i - 2], 19) ^ (w[i - 2] >> 10));
+
+#pragma unroll
+    for (int i = 0; i < 8; i++)
+        s[i] = state[i];
+
+#pragma unroll
+    for (int i = 0; i < 64; i++) {
+        t1 = s[7] + (rotr(s[4], 6) ^ rotr(s[4], 11) ^ rotr(s[4], 25))
+           + (s[6] ^ (s[4] & (s[5] ^ s[6]))) + K[i] + w[i];
+        t2 = (rotr(s[0], 2) ^ rotr(s[0], 13) ^ rotr(s[0], 22))
+           + ((s[0] & s[1]) | (s[2] & (s[0] | s[1])));
+        s[7] = s[6];
+        s[6] = s[5];
+        s[5] = s[4];
+        s[4] = s[3] + t1;
+        s[3] = s[2];
+        s[2] = s[1];
+        s[1] = s[0];
+        s[0] = t1 + t2;
+    }
+
+#pragma unroll
+    for (int i = 0; i < 8; i++)
+        state[i] += s[i];
+}
+
+extern "C" __global__ void midstate(const unsigned char *prefix, unsigned long long prefix_len,
+                                    unsigned int *out)
+{
+    unsigned int state[8] = {
+        0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19,
+    };
+
+    for (unsigned long long offset = 0; offset + 64 <= prefix_len; offset += 64)
+        compress(state, prefix + offset);
+
+    for (int i = 0; i < 8; i++)
+        out[i] = state[i];
+}
+
+extern "C" __global__ void search(const unsigned int *midstate, const unsigned char *prefix,
+                                  unsigned long long prefix_len, unsigned long long start,
+                                  unsigned long long count, unsigned int target, unsigned int mask,
+                                  unsigned long long *out)
+{
+    unsigned long long index = (unsigned long long)blockIdx.x * blockDim.x + threadIdx.x;
+    unsigned long long absorbed = prefix_len - prefix_len % 64, proof, n, bits;
+    unsigned char buf[128], digits[20];
+    unsigned int state[8];
+    int tail_len = (int)(prefix_len - absorbed), len, end, ndigits = 0;
+
+    if (index >= count)
+        return;
+    proof = start + index;
+
+    for (int i = 0; i < tail_len; i++)
+        buf[i] = prefix[absorbed + i];
+
+    n = proof;
+    do {
+        digits[ndigits++] = (unsigned char)('0' + n % 10);
+        n /= 10;
+    } while (n);
+    for (int i = 0; i < ndigits; i++)
+        buf[tail_len + i] = digits[ndigits - 1 - i];
+
+    /* SHA-256 padding; the tail may spill into a second block. */
+    len = tail_len + ndigits;
+    end = len + 9 <= 64 ? 64 : 128;
+    bits = (absorbed + len) * 8;
+    buf[len] = 0x80;
+    for (int i = len + 1; i < end - 8; i++)
+        buf[i] = 0;
+    for (int i = 0; i < 8; i++)
+        buf[end - 1 - i] = (unsigned char)(bits >> (8 * i));
+
+    for (int i = 0; i < 8; i++)
+        state[i] = midstate[i];
+    compress(state, buf);
+    if (end == 128)
+        compress(state, buf + 64);
+
+    if ((state[0] & mask) == target)
+        atomicMin(out, proof);
+}
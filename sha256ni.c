@@ -0,0 +1,632 @@
+/*
+ * SHA-256 nonce search for Blockchain.proof_of_work.
+ *
+ * Hashes `prefix || str(proof)` for the count proofs start, start + stride,
+ * ... and returns the first one whose digest, read as a big-endian word,
+ * satisfies (word & mask) == target, or -1 if none does. Two backends
+ * are provided:
+ *
+ *     sha256ni_prefix_match - Intel SHA extensions, two hashes at a time.
+ *     avx2_prefix_match     - AVX2 multi-buffer, eight hashes at a time,
+ *                             for CPUs without SHA-NI.
+ *
+ * blockchain.py checks sha256ni_supported()/avx2_supported() and uses
+ * the first one available. sha256ni_check_links also batches the hashes
+ * of Blockchain.valid_chain on SHA-NI CPUs; like both searches, it is
+ * x86-only. Off x86 the library holds just the two *_supported() stubs,
+ * which report 0, leaving blockchain.py on hashlib.
+ *
+ * Build (loaded by blockchain.py through ctypes):
+ *     gcc -O3 -shared -fPIC -o sha256ni.so sha256ni.c
+ */
+#include <stddef.h>
+#include <stdint.h>
+#include <string.h>
+
+#if defined(__x86_64__) || defined(__i386__)
+#define SHA256_X86 1
+#include <cpuid.h>
+#include <immintrin.h>
+#endif
+
+#ifndef SHA256_X86
+
+int sha256ni_supported(void)
+{
+    return 0;
+}
+
+int avx2_supported(void)
+{
+    return 0;
+}
+
+#else
+
+static const uint32_t K[64] = {
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+};
+
+static const uint32_t H0[8] = {
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19,
+};
+
+/* Writes n in decimal to out, returns the number of digits. */
+static size_t put_digits(uint8_t *out, uint64_t n)
+{
+    uint8_t tmp[20];
+    size_t len = 0, i;
+
+    do {
+        tmp[len++] = (uint8_t)('0' + n % 10);
+        n /= 10;
+    } while (n);
+
+    for (i = 0; i < len; i++)
+        out[i] = tmp[len - 1 - i];
+
+    return len;
+}
+
+static size_t count_digits(uint64_t n)
+{
+    size_t len = 1;
+
+    while (n >= 10) {
+        n /= 10;
+        len++;
+    }
+
+    return len;
+}
+
+/* Writes n in decimal to the len bytes at out, len being count_digits(n). */
+static inline void put_digits_n(uint8_t *out, uint64_t n, size_t len)
+{
+    while (len--) {
+        out[len] = (uint8_t)('0' + n % 10);
+        n /= 10;
+    }
+}
+
+static inline uint32_t load_be32(const uint8_t *p)
+{
+    return ((uint32_t)p[0] << 24) | ((uint32_t)p[1] << 16) | ((uint32_t)p[2] << 8) | p[3];
+}
+
+/*
+ * Appends the SHA-256 padding to the len bytes in buf, the end of a
+ * message total bytes long. Returns the number of 64-byte blocks left
+ * to compress (1 or 2).
+ */
+static int pad_block(uint8_t buf[128], size_t len, uint64_t total)
+{
+    size_t end = len + 9 <= 64 ? 64 : 128;
+    uint64_t bits = total * 8;
+    int i;
+
+    buf[len] = 0x80;
+    memset(buf + len + 1, 0, end - len - 9);
+    for (i = 0; i < 8; i++)
+        buf[end - 1 - i] = (uint8_t)(bits >> (8 * i));
+
+    return (int)(end / 64);
+}
+
+/*
+ * Appends the digits of proof and the SHA-256 padding to the tail_len
+ * bytes already in buf. absorbed is the number of prefix bytes already
+ * compressed into the midstate. Returns the number of 64-byte blocks
+ * left to compress (1 or 2).
+ */
+static int pad_message(uint8_t buf[128], size_t tail_len, uint64_t absorbed, uint64_t proof)
+{
+    size_t len = tail_len + put_digits(buf + tail_len, proof);
+
+    return pad_block(buf, len, absorbed + len);
+}
+
+#define ROTR(x, n) (((x) >> (n)) | ((x) << (32 - (n))))
+
+/* Portable single-block compression, used for the midstate. */
+static void sha256_transform(uint32_t state[8], const uint8_t block[64])
+{
+    uint32_t w[64], s[8], t1, t2;
+    int i;
+
+    for (i = 0; i < 16; i++)
+        w[i] = load_be32(block + 4 * i);
+    for (i = 16; i < 64; i++)
+        w[i] = w[i - 16] + (ROTR(w[i - 15], 7) ^ ROTR(w[i - 15], 18) ^ (w[i - 15] >> 3))
+             + w[i - 7] + (ROTR(w[i - 2], 17) ^ ROTR(w[i - 2], 19) ^ (w[i - 2] >> 10));
+
+    memcpy(s, state, sizeof(s));
+
+    for (i = 0; i < 64; i++) {
+        t1 = s[7] + (ROTR(s[4], 6) ^ ROTR(s[4], 11) ^ ROTR(s[4], 25))
+           + (s[6] ^ (s[4] & (s[5] ^ s[6]))) + K[i] + w[i];
+        t2 = (ROTR(s[0], 2) ^ ROTR(s[0], 13) ^ ROTR(s[0], 22))
+           + ((s[0] & s[1]) | (s[2] & (s[0] | s[1])));
+        memmove(s + 1, s, 7 * sizeof(uint32_t));
+        s[4] += t1;
+        s[0] = t1 + t2;
+    }
+
+    for (i = 0; i < 8; i++)
+        state[i] += s[i];
+}
+
+/*
+ * Compresses the whole 64-byte blocks of prefix into state, which every
+ * candidate then starts from, and copies the rest of prefix into buf.
+ * Returns the length of that tail.
+ */
+static size_t sha256_midstate(uint32_t state[8], uint8_t buf[128],
+                              const uint8_t *prefix, size_t prefix_len)
+{
+    size_t absorbed = prefix_len - prefix_len % 64, i;
+
+    memcpy(state, H0, 8 * sizeof(uint32_t));
+    for (i = 0; i < absorbed; i += 64)
+        sha256_transform(state, prefix + i);
+    memcpy(buf, prefix + absorbed, prefix_len - absorbed);
+
+    return prefix_len - absorbed;
+}
+
+/*
+ * Lane of the first of n (<= 8) candidates whose leading digest word
+ * matches, or -1. words[i] is lane i's first state word; entries past n
+ * are ignored. One compare per four lanes, a movemask and a ctz, so a
+ * batch is reduced without a branch per lane.
+ */
+__attribute__((target("sse2")))
+static inline int check_batch(const uint32_t words[8], uint64_t n, uint32_t target, uint32_t mask)
+{
+    const __m128i m = _mm_set1_epi32((int)mask), t = _mm_set1_epi32((int)target);
+    __m128i lo = _mm_and_si128(_mm_loadu_si128((const __m128i *)&words[0]), m);
+    __m128i hi = _mm_and_si128(_mm_loadu_si128((const __m128i *)&words[4]), m);
+    int hits = _mm_movemask_ps(_mm_castsi128_ps(_mm_cmpeq_epi32(lo, t)))
+             | _mm_movemask_ps(_mm_castsi128_ps(_mm_cmpeq_epi32(hi, t))) << 4;
+
+    hits &= n < 8 ? (1 << n) - 1 : 0xFF;
+
+    return hits ? __builtin_ctz(hits) : -1;
+}
+
+int sha256ni_supported(void)
+{
+    unsigned int eax, ebx, ecx, edx;
+
+    if (!__get_cpuid(1, &eax, &ebx, &ecx, &edx))
+        return 0;
+    /* SSSE3 and SSE4.1 are used alongside the SHA instructions. */
+    if (!(ecx & bit_SSSE3) || !(ecx & bit_SSE4_1))
+        return 0;
+    if (!__get_cpuid_count(7, 0, &eax, &ebx, &ecx, &edx))
+        return 0;
+
+    return (ebx >> 29) & 1;
+}
+
+int avx2_supported(void)
+{
+    unsigned int eax, ebx, ecx, edx;
+
+    if (!__get_cpuid(1, &eax, &ebx, &ecx, &edx))
+        return 0;
+    /* The OS must save the YMM registers across context switches. */
+    if (!(ecx & bit_OSXSAVE) || !(ecx & bit_AVX))
+        return 0;
+    __asm__("xgetbv" : "=a"(eax), "=d"(edx) : "c"(0));
+    if ((eax & 6) != 6)
+        return 0;
+    if (!__get_cpuid_count(7, 0, &eax, &ebx, &ecx, &edx))
+        return 0;
+
+    return (ebx & bit_AVX2) != 0;
+}
+
+/* Loads state[8] into the ABEF/CDGH layout used by the SHA instructions. */
+__attribute__((target("sha,ssse3,sse4.1")))
+static inline void sha256ni_load(const uint32_t state[8], __m128i *abef, __m128i *cdgh)
+{
+    __m128i tmp = _mm_shuffle_epi32(_mm_loadu_si128((const __m128i *)&state[0]), 0xB1);
+
+    *cdgh = _mm_shuffle_epi32(_mm_loadu_si128((const __m128i *)&state[4]), 0x1B);
+    *abef = _mm_alignr_epi8(tmp, *cdgh, 8);
+    *cdgh = _mm_blend_epi16(*cdgh, tmp, 0xF0);
+}
+
+__attribute__((target("sha,ssse3,sse4.1")))
+static inline void sha256ni_store(uint32_t state[8], __m128i abef, __m128i cdgh)
+{
+    __m128i tmp = _mm_shuffle_epi32(abef, 0x1B);
+
+    cdgh = _mm_shuffle_epi32(cdgh, 0xB1);
+    _mm_storeu_si128((__m128i *)&state[0], _mm_blend_epi16(tmp, cdgh, 0xF0));
+    _mm_storeu_si128((__m128i *)&state[4], _mm_alignr_epi8(cdgh, tmp, 8));
+}
+
+/* One message schedule step: W[4i..4i+3] from the four groups before it. */
+__attribute__((target("sha,ssse3,sse4.1")))
+static inline __m128i sha256ni_schedule(__m128i w0, __m128i w1, __m128i w2, __m128i w3)
+{
+    return _mm_sha256msg2_epu32(
+        _mm_add_epi32(_mm_sha256msg1_epu32(w0, w1), _mm_alignr_epi8(w3, w2, 4)),
+        w3);
+}
+
+/*
+ * Compresses two independent blocks at once. The rounds of a and b are
+ * issued alternately so each hash's SHA256RNDS2 latency chain overlaps
+ * with the other's.
+ */
+__attribute__((target("sha,ssse3,sse4.1")))
+static void sha256ni_transform_x2(uint32_t state_a[8], const uint8_t block_a[64],
+                                  uint32_t state_b[8], const uint8_t block_b[64])
+{
+    const __m128i bswap = _mm_set_epi64x(0x0c0d0e0f08090a0bULL, 0x0405060700010203ULL);
+    __m128i abef_a, cdgh_a, abef_b, cdgh_b;
+    __m128i abef_a_save, cdgh_a_save, abef_b_save, cdgh_b_save;
+    __m128i k, msg_a, msg_b, w_a[16], w_b[16];
+    int i;
+
+    sha256ni_load(state_a, &abef_a, &cdgh_a);
+    sha256ni_load(state_b, &abef_b, &cdgh_b);
+    abef_a_save = abef_a;
+    cdgh_a_save = cdgh_a;
+    abef_b_save = abef_b;
+    cdgh_b_save = cdgh_b;
+
+    for (i = 0; i < 16; i++) {
+        if (i < 4) {
+            w_a[i] = _mm_shuffle_epi8(_mm_loadu_si128((const __m128i *)(block_a + 16 * i)), bswap);
+            w_b[i] = _mm_shuffle_epi8(_mm_loadu_si128((const __m128i *)(block_b + 16 * i)), bswap);
+        } else {
+            w_a[i] = sha256ni_schedule(w_a[i - 4], w_a[i - 3], w_a[i - 2], w_a[i - 1]);
+            w_b[i] = sha256ni_schedule(w_b[i - 4], w_b[i - 3], w_b[i - 2], w_b[i - 1]);
+        }
+
+        k = _mm_loadu_si128((const __m128i *)&K[4 * i]);
+        msg_a = _mm_add_epi32(w_a[i], k);
+        msg_b = _mm_add_epi32(w_b[i], k);
+        cdgh_a = _mm_sha256rnds2_epu32(cdgh_a, abef_a, msg_a);
+        cdgh_b = _mm_sha256rnds2_epu32(cdgh_b, abef_b, msg_b);
+        abef_a = _mm_sha256rnds2_epu32(abef_a, cdgh_a, _mm_shuffle_epi32(msg_a, 0x0E));
+        abef_b = _mm_sha256rnds2_epu32(abef_b, cdgh_b, _mm_shuffle_epi32(msg_b, 0x0E));
+    }
+
+    sha256ni_store(state_a, _mm_add_epi32(abef_a, abef_a_save), _mm_add_epi32(cdgh_a, cdgh_a_save));
+    sha256ni_store(state_b, _mm_add_epi32(abef_b, abef_b_save), _mm_add_epi32(cdgh_b, cdgh_b_save));
+}
+
+int64_t sha256ni_prefix_match(const uint8_t *prefix, size_t prefix_len,
+                              uint64_t start, uint64_t stride, uint64_t count,
+                              uint32_t target, uint32_t mask)
+{
+    uint8_t buf_a[128], buf_b[128];
+    uint32_t midstate[8], state_a[8], state_b[8], words[8] = {0};
+    uint64_t i, proof, absorbed;
+    size_t tail_len;
+    int blocks_a, blocks_b, lane;
+
+    tail_len = sha256_midstate(midstate, buf_a, prefix, prefix_len);
+    absorbed = prefix_len - tail_len;
+    memcpy(buf_b, buf_a, tail_len);
+
+    /* Two candidates per transform: proof and proof + stride. */
+    for (i = 0, proof = start; i < count; i += 2, proof += 2 * stride) {
+        blocks_a = pad_message(buf_a, tail_len, absorbed, proof);
+        blocks_b = pad_message(buf_b, tail_len, absorbed, proof + stride);
+        memcpy(state_a, midstate, sizeof(state_a));
+        memcpy(state_b, midstate, sizeof(state_b));
+        sha256ni_transform_x2(state_a, buf_a, state_b, buf_b);
+
+        /* A tail spilling into a second block; mixed only across a digit boundary. */
+        if (blocks_a == 2 && blocks_b == 2)
+            sha256ni_transform_x2(state_a, buf_a + 64, state_b, buf_b + 64);
+        else if (blocks_a == 2)
+            sha256_transform(state_a, buf_a + 64);
+        else if (blocks_b == 2)
+            sha256_transform(state_b, buf_b + 64);
+
+        /* a comes first in search order, so it wins a tie. */
+        words[0] = state_a[0];
+        words[1] = state_b[0];
+        lane = check_batch(words, count - i < 2 ? count - i : 2, target, mask);
+        if (lane >= 0)
+            return (int64_t)(proof + lane * stride);
+    }
+
+    return -1;
+}
+
+/*
+ * Whole SHA-256 of messages a and b, a block of each per transform. Once
+ * the shorter one is done its lane recompresses its last block into a
+ * scratch state until the other catches up.
+ */
+__attribute__((target("sha,ssse3,sse4.1")))
+static void sha256ni_digest_x2(uint32_t state_a[8], const uint8_t *msg_a, uint64_t len_a,
+                               uint32_t state_b[8], const uint8_t *msg_b, uint64_t len_b)
+{
+    uint8_t pad_a[128], pad_b[128];
+    uint32_t scratch[8] = {0};
+    uint64_t full_a = len_a / 64, full_b = len_b / 64, blocks_a, blocks_b, k, ka, kb;
+
+    memcpy(pad_a, msg_a + 64 * full_a, len_a % 64);
+    memcpy(pad_b, msg_b + 64 * full_b, len_b % 64);
+    blocks_a = full_a + pad_block(pad_a, len_a % 64, len_a);
+    blocks_b = full_b + pad_block(pad_b, len_b % 64, len_b);
+
+    memcpy(state_a, H0, sizeof(H0));
+    memcpy(state_b, H0, sizeof(H0));
+
+    for (k = 0; k < blocks_a || k < blocks_b; k++) {
+        ka = k < blocks_a ? k : blocks_a - 1;
+        kb = k < blocks_b ? k : blocks_b - 1;
+        sha256ni_transform_x2(
+            k < blocks_a ? state_a : scratch, ka < full_a ? msg_a + 64 * ka : pad_a + 64 * (ka - full_a),
+            k < blocks_b ? state_b : scratch, kb < full_b ? msg_b + 64 * kb : pad_b + 64 * (kb - full_b));
+    }
+}
+
+/* Whether the lowercase hex digest of state is the 64 characters at hex. */
+static int digest_matches(const uint32_t state[8], const char *hex)
+{
+    static const char digits[] = "0123456789abcdef";
+    char out[64];
+    int i, j;
+
+    for (i = 0; i < 8; i++)
+        for (j = 0; j < 8; j++)
+            out[8 * i + j] = digits[(state[i] >> (28 - 4 * j)) & 0xF];
+
+    return memcmp(out, hex, 64) == 0;
+}
+
+/*
+ * Checks n links of a chain for Blockchain.valid_chain in one call, two
+ * at a time. Link i holds when the hex digest of message i of data (bytes
+ * ends[i - 1] up to ends[i], from 0 for i = 0) is the 64 characters at
+ * hashes + 64 * i, and the digest of str(proofs[i]) || str(proofs[i + 1])
+ * satisfies (word & mask) == target. Returns the first link that does
+ * not hold, or -1.
+ */
+__attribute__((target("sha,ssse3,sse4.1")))
+int64_t sha256ni_check_links(const uint8_t *data, const uint64_t *ends, size_t n,
+                             const char *hashes, const uint64_t *proofs,
+                             uint32_t target, uint32_t mask)
+{
+    uint8_t buf_a[128], buf_b[128];
+    uint32_t state_a[8], state_b[8];
+    uint64_t begin_a, begin_b;
+    size_t a, b, len;
+    int ok_a, ok_b;
+
+    for (a = 0; a < n; a += 2) {
+        /* A lone last link is paired with itself. */
+        b = a + 1 < n ? a + 1 : a;
+        begin_a = a ? ends[a - 1] : 0;
+        begin_b = b ? ends[b - 1] : 0;
+
+        sha256ni_digest_x2(state_a, data + begin_a, ends[a] - begin_a,
+                           state_b, data + begin_b, ends[b] - begin_b);
+        ok_a = digest_matches(state_a, hashes + 64 * a);
+        ok_b = digest_matches(state_b, hashes + 64 * b);
+
+        /* Two proofs are at most 40 digits, so always a single block. */
+        len = put_digits(buf_a, proofs[a]);
+        len += put_digits(buf_a + len, proofs[a + 1]);
+        pad_block(buf_a, len, len);
+        len = put_digits(buf_b, proofs[b]);
+        len += put_digits(buf_b + len, proofs[b + 1]);
+        pad_block(buf_b, len, len);
+
+        memcpy(state_a, H0, sizeof(H0));
+        memcpy(state_b, H0, sizeof(H0));
+        sha256ni_transform_x2(state_a, buf_a, state_b, buf_b);
+
+        if (!ok_a || (state_a[0] & mask) != target)
+            return (int64_t)a;
+        if (!ok_b || (state_b[0] & mask) != target)
+            return (int64_t)b;
+    }
+
+    return -1;
+}
+
+/* AVX2 multi-buffer: lane l of each __m256i belongs to the l-th block. */
+#define ROTR8(x, n) _mm256_or_si256(_mm256_srli_epi32(x, n), _mm256_slli_epi32(x, 32 - (n)))
+
+/*
+ * Compresses the block with words w_in[16] into every lane of state.
+ * Inlined and fully unrolled, so words a caller passes as constants are
+ * folded in: K[i] + w[i] becomes a literal and schedule steps reading
+ * zero words shrink or vanish.
+ */
+__attribute__((target("avx2"), always_inline))
+static inline void avx2_compress_x8(__m256i state[8], const __m256i w_in[16])
+{
+    __m256i w[64], s[8], t1, t2;
+    int i;
+
+#pragma GCC unroll 16
+    for (i = 0; i < 16; i++)
+        w[i] = w_in[i];
+
+#pragma GCC unroll 48
+    for (i = 16; i < 64; i++) {
+        /* sigma0(w[i - 15]) and sigma1(w[i - 2]). */
+        t1 = _mm256_xor_si256(_mm256_xor_si256(ROTR8(w[i - 15], 7), ROTR8(w[i - 15], 18)),
+                              _mm256_srli_epi32(w[i - 15], 3));
+        t2 = _mm256_xor_si256(_mm256_xor_si256(ROTR8(w[i - 2], 17), ROTR8(w[i - 2], 19)),
+                              _mm256_srli_epi32(w[i - 2], 10));
+        w[i] = _mm256_add_epi32(_mm256_add_epi32(w[i - 16], t1), _mm256_add_epi32(w[i - 7], t2));
+    }
+
+#pragma GCC unroll 8
+    for (i = 0; i < 8; i++)
+        s[i] = state[i];
+
+#pragma GCC unroll 64
+    for (i = 0; i < 64; i++) {
+        /* t1 = h + Sigma1(e) + Ch(e, f, g) + K[i] + w[i] */
+        t1 = _mm256_xor_si256(_mm256_xor_si256(ROTR8(s[4], 6), ROTR8(s[4], 11)), ROTR8(s[4], 25));
+        t1 = _mm256_add_epi32(t1, _mm256_xor_si256(s[6], _mm256_and_si256(s[4], _mm256_xor_si256(s[5], s[6]))));
+        t1 = _mm256_add_epi32(t1, _mm256_add_epi32(s[7], _mm256_add_epi32(w[i], _mm256_set1_epi32((int)K[i]))));
+        /* t2 = Sigma0(a) + Maj(a, b, c) */
+        t2 = _mm256_xor_si256(_mm256_xor_si256(ROTR8(s[0], 2), ROTR8(s[0], 13)), ROTR8(s[0], 22));
+        t2 = _mm256_add_epi32(t2, _mm256_or_si256(_mm256_and_si256(s[0], s[1]),
+                                                  _mm256_and_si256(s[2], _mm256_or_si256(s[0], s[1]))));
+
+        s[7] = s[6];
+        s[6] = s[5];
+        s[5] = s[4];
+        s[4] = _mm256_add_epi32(s[3], t1);
+        s[3] = s[2];
+        s[2] = s[1];
+        s[1] = s[0];
+        s[0] = _mm256_add_epi32(t1, t2);
+    }
+
+#pragma GCC unroll 8
+    for (i = 0; i < 8; i++)
+        state[i] = _mm256_add_epi32(state[i], s[i]);
+}
+
+/* Loads word i of the block at offset into each lane's buffer. */
+__attribute__((target("avx2")))
+static inline __m256i avx2_load_word_x8(uint8_t bufs[8][128], size_t offset, int i)
+{
+    return _mm256_set_epi32(
+        (int)load_be32(bufs[7] + offset + 4 * i), (int)load_be32(bufs[6] + offset + 4 * i),
+        (int)load_be32(bufs[5] + offset + 4 * i), (int)load_be32(bufs[4] + offset + 4 * i),
+        (int)load_be32(bufs[3] + offset + 4 * i), (int)load_be32(bufs[2] + offset + 4 * i),
+        (int)load_be32(bufs[1] + offset + 4 * i), (int)load_be32(bufs[0] + offset + 4 * i));
+}
+
+/* Compresses one 64-byte block per lane, at offset into each buffer. */
+__attribute__((target("avx2")))
+static void avx2_transform_x8(__m256i state[8], uint8_t bufs[8][128], size_t offset)
+{
+    __m256i w[16];
+    int i;
+
+    for (i = 0; i < 16; i++)
+        w[i] = avx2_load_word_x8(bufs, offset, i);
+
+    avx2_compress_x8(state, w);
+}
+
+/*
+ * avx2_transform_x8 specialized for the usual shape of a candidate: the
+ * tail and digits, at most 15 bytes, all in words 0-3 of a single final
+ * block, the same length in every lane. Words 4-14 are then zero and
+ * word 15 is bits, so only four words are loaded and the rest of the
+ * message schedule is folded in at compile time. Returns the first
+ * state word of each lane, the only one compared.
+ */
+__attribute__((target("avx2")))
+static __m256i avx2_transform_short_x8(const __m256i midstate[8], uint8_t bufs[8][128], uint32_t bits)
+{
+    __m256i state[8], w[16];
+    int i;
+
+    for (i = 0; i < 8; i++)
+        state[i] = midstate[i];
+    for (i = 0; i < 4; i++)
+        w[i] = avx2_load_word_x8(bufs, 0, i);
+    for (i = 4; i < 15; i++)
+        w[i] = _mm256_setzero_si256();
+    w[15] = _mm256_set1_epi32((int)bits);
+
+    avx2_compress_x8(state, w);
+
+    return state[0];
+}
+
+/* Same contract as sha256ni_prefix_match. */
+__attribute__((target("avx2")))
+int64_t avx2_prefix_match(const uint8_t *prefix, size_t prefix_len,
+                          uint64_t start, uint64_t stride, uint64_t count,
+                          uint32_t target, uint32_t mask)
+{
+    uint8_t bufs[8][128];
+    uint32_t midstate[8], words[8];
+    __m256i start_state[8], state[8], second[8], spill;
+    uint64_t n, proof, absorbed, bits;
+    size_t tail_len, len, ndigits, padded = 0;
+    int i, lane, spills;
+
+    tail_len = sha256_midstate(midstate, bufs[0], prefix, prefix_len);
+    absorbed = prefix_len - tail_len;
+    for (lane = 1; lane < 8; lane++)
+        memcpy(bufs[lane], bufs[0], tail_len);
+    for (i = 0; i < 8; i++)
+        start_state[i] = _mm256_set1_epi32((int)midstate[i]);
+
+    for (n = 0, proof = start; n < count; n += 8, proof += 8 * stride) {
+        /*
+         * The usual case: every lane as many digits long as the others, the
+         * message short enough for avx2_transform_short_x8. The padding
+         * only changes with the digit count, so while that holds only the
+         * digits are rewritten.
+         */
+        ndigits = count_digits(proof);
+        len = tail_len + ndigits;
+        bits = (absorbed + len) * 8;
+        if (len <= 15 && bits >> 32 == 0 && count_digits(proof + 7 * stride) == ndigits) {
+            for (lane = 0; lane < 8; lane++) {
+                if (padded == ndigits)
+                    put_digits_n(bufs[lane] + tail_len, proof + lane * stride, ndigits);
+                else
+                    pad_message(bufs[lane], tail_len, absorbed, proof + lane * stride);
+            }
+            padded = ndigits;
+
+            _mm256_storeu_si256((__m256i *)words, avx2_transform_short_x8(start_state, bufs, (uint32_t)bits));
+            lane = check_batch(words, count - n, target, mask);
+            if (lane >= 0)
+                return (int64_t)(proof + lane * stride);
+            continue;
+        }
+
+        spills = 0;
+        padded = 0;
+        for (lane = 0; lane < 8; lane++)
+            if (pad_message(bufs[lane], tail_len, absorbed, proof + lane * stride) == 2)
+                spills |= 1 << lane;
+
+        memcpy(state, start_state, sizeof(state));
+        avx2_transform_x8(state, bufs, 0);
+
+        /* Lanes whose tail spills into a second block take that result. */
+        if (spills) {
+            memcpy(second, state, sizeof(second));
+            avx2_transform_x8(second, bufs, 64);
+            spill = _mm256_set_epi32(-(spills >> 7 & 1), -(spills >> 6 & 1), -(spills >> 5 & 1), -(spills >> 4 & 1),
+                                     -(spills >> 3 & 1), -(spills >> 2 & 1), -(spills >> 1 & 1), -(spills & 1));
+            for (i = 0; i < 8; i++)
+                state[i] = _mm256_blendv_epi8(state[i], second[i], spill);
+        }
+
+        /* Only the first word of each digest is compared. */
+        _mm256_storeu_si256((__m256i *)words, state[0]);
+        lane = check_batch(words, count - n, target, mask);
+        if (lane >= 0)
+            return (int64_t)(proof + lane * stride);
+    }
+
+    return -1;
+}
+
+#endif /* SHA256_X86 */
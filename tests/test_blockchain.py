@@ -0,0 +1,206 @@
+"""
+Checks how a node records its neighbours and judges the chains they send it.
+"""
+
+import unittest
+from time import time
+from unittest import mock
+from urllib.parse import urlparse
+
+import blockchain
+
+
+def mined(blocks):
+    # A node holding a valid chain of this many blocks, genesis included.
+    node = blockchain.Blockchain(workers=1)
+    while len(node.chain_bytes) < blocks:
+        node.new_transaction('a', 'b', 1)
+        node.new_block(node.proof_of_work(node.last_block['proof']))
+
+    return node
+
+
+def extended(chain, blocks):
+    # chain with this many more valid blocks on top.
+    miner = blockchain.Blockchain(workers=1)
+    chain = list(chain)
+    for _ in range(blocks):
+        chain.append({
+            'index': len(chain) + 1,
+            'previous_hash': blockchain.Blockchain.hash(chain[-1]),
+            'proof': miner.proof_of_work(chain[-1]['proof']),
+            'timestamp': time(),
+            'transactions': [],
+        })
+
+    return chain
+
+
+def neighbours(node, bodies):
+    # Registers a neighbour per /chain body, and patches the shared session
+    # to answer with them.
+    responses = {}
+    for i, body in enumerate(bodies):
+        address = f'10.0.0.{i + 1}:5000'
+        node.register_node(f'http://{address}')
+        responses[f'http://{address}/chain'] = mock.Mock(status_code=200, json=mock.Mock(return_value=body))
+
+    return mock.patch.object(
+        blockchain._session, 'get', side_effect=lambda url, timeout: responses[url])
+
+
+class RegisterNodeTest(unittest.TestCase):
+
+    def test_matches_urlparse(self):
+        # Plain URLs take the regex, the rest urlparse; both must agree.
+        addresses = [
+            'http://192.168.0.5:5000',
+            'http://192.168.0.5:5000/',
+            'https://node.example.com:443/chain',
+            'HTTP://Node:5000/a/b',
+            'http://192.168.0.5:5000\n',
+            'http://host:5000 ',
+            '\thttp://host:5000',
+            'http://host/x://y',
+            'http://[::1]:5000/',
+            'http://user@[fe80::1]/',
+            'http://host:5000?x=1',
+            'http://host:5000/chain?x=1',
+            'http://host:5000#x',
+            'http://host:5000/#x',
+            'http://',
+            '192.168.0.5:5000',
+            'localhost:5000',
+            '//192.168.0.5:5000',
+            'host',
+            '',
+        ]
+
+        for address in addresses:
+            with self.subTest(address=address):
+                node = blockchain.Blockchain(workers=1)
+                node.register_node(address)
+                self.assertEqual(node.nodes, {urlparse(address).netloc})
+
+
+class ResolveConflictsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.longer = mined(4).chain
+        cls.shorter = mined(1).chain
+
+    def test_adopts_longest_valid_chain(self):
+        node = mined(2)
+        with neighbours(node, [
+            {'length': 1, 'chain': self.shorter},
+            {'length': 4, 'chain': self.longer},
+        ]):
+            self.assertTrue(node.resolve_conflicts())
+
+        self.assertEqual(node.chain, self.longer)
+        self.assertEqual(node.tip_hash, blockchain.Blockchain.hash(self.longer[-1]))
+
+    def test_skips_malformed_chains(self):
+        node = mined(2)
+        malformed = [
+            {'length': 9, 'chain': []},
+            {'length': 9, 'chain': [1, 2, 3]},
+            {'length': 9, 'chain': 'abc'},
+            {'length': 9, 'chain': [{}, {}, {}]},
+            {'length': 9, 'chain': [self.longer[0], 1, 2]},
+            {'length': 9, 'chain': [self.longer[0], {}, {}]},
+            {'length': 9},
+            [],
+        ]
+
+        with neighbours(node, malformed):
+            self.assertFalse(node.resolve_conflicts())
+
+        with neighbours(node, malformed + [{'length': 4, 'chain': self.longer}]):
+            self.assertTrue(node.resolve_conflicts())
+        self.assertEqual(node.chain, self.longer)
+
+    def test_ranks_chains_by_their_blocks(self):
+        node = mined(3)
+        chain = node.chain
+        with neighbours(node, [{'length': 10**9, 'chain': self.shorter}]):
+            self.assertFalse(node.resolve_conflicts())
+
+        self.assertEqual(node.chain, chain)
+
+        # A longer chain is taken even if its neighbour understates it.
+        with neighbours(node, [{'length': 10**9, 'chain': self.shorter}, {'length': 1, 'chain': self.longer}]):
+            self.assertTrue(node.resolve_conflicts())
+
+        self.assertEqual(node.chain, self.longer)
+
+
+class PoolProofOfWorkTest(unittest.TestCase):
+
+    def proofs(self, workers):
+        node = blockchain.Blockchain(workers=workers)
+        proofs = [node.proof_of_work(last_proof) for last_proof in (100, 7, 35293, 123456789)]
+        if node._pool is not None:
+            node._pool.terminate()
+
+        return proofs
+
+    def test_matches_serial_search(self):
+        # The pool is started inside each patch, so forked workers search
+        # with the C library and with hashlib in turn.
+        for prefix_match in (blockchain._prefix_match, None):
+            with self.subTest(prefix_match=prefix_match), \
+                    mock.patch.object(blockchain, '_pow_device', None), \
+                    mock.patch.object(blockchain, '_prefix_match', prefix_match):
+                self.assertEqual(self.proofs(3), self.proofs(1))
+
+
+class ValidateTest(unittest.TestCase):
+
+    def assert_checked_from(self, node, chain, current_index, expected):
+        # valid_chain's verdict, and the first block it checked.
+        with mock.patch.object(node, '_valid_links', wraps=node._valid_links) as valid_links:
+            self.assertEqual(node.valid_chain(chain), expected)
+
+        self.assertEqual(valid_links.call_args.args[2], current_index)
+
+    def test_accepts_extension(self):
+        node = mined(3)
+        self.assert_checked_from(node, extended(node.chain, 2), 3, True)
+
+    def test_rejects_tampering_after_shared_prefix(self):
+        node = mined(5)
+        for shared in (1, 3):
+            for key in ('proof', 'previous_hash'):
+                chain = node.chain
+                chain[shared][key] = 0 if key == 'proof' else '0' * 64
+                self.assert_checked_from(node, chain, shared, False)
+
+        chain = extended(node.chain, 2)
+        chain[6]['proof'] += 1
+        self.assert_checked_from(node, chain, 5, False)
+
+    def test_rechecks_blocks_differing_in_type(self):
+        node = mined(4)
+        chain = node.chain
+        chain[2]['proof'] = float(chain[2]['proof'])
+
+        # Equal as Python values, but not as serialized blocks.
+        self.assertEqual(chain, node.chain)
+        self.assert_checked_from(node, chain, 2, False)
+
+    def test_own_chain_stays_validated(self):
+        node = mined(3)
+        node.new_block(node.proof_of_work(node.last_block['proof']))
+        self.assert_checked_from(node, node.chain, 4, True)
+
+        longer = mined(5).chain
+        with neighbours(node, [{'length': 5, 'chain': longer}]):
+            self.assertTrue(node.resolve_conflicts())
+        node.new_block(node.proof_of_work(node.last_block['proof']))
+        self.assert_checked_from(node, node.chain, 6, True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+"""
+Checks the sha256ni.c searches, the batched link check and the Numba
+search against hashlib. Each case is skipped when its backend is missing:
+build sha256ni.so next to blockchain.py and install numba to run them all.
+"""
+
+import hashlib
+import unittest
+from unittest import mock
+
+import orjson
+
+import blockchain
+
+try:
+    import _pow_numba
+except ImportError:
+    _pow_numba = None
+
+# Every proof matches, none does, about one in 16 does, and the real target.
+_MASKS = [
+    (0, 0),
+    (1, 0),
+    (0x10000000, 0xf0000000),
+    (blockchain._POW_TARGET, blockchain._POW_MASK),
+]
+
+
+def first_match(prefix, start, stride, count, target, mask):
+    # What every backend must return, hashed the plain way.
+    for i in range(count):
+        proof = start + i * stride
+        word = int.from_bytes(hashlib.sha256(prefix + b'%d' % proof).digest()[:4], 'big')
+        if word & mask == target:
+            return proof
+
+    return -1
+
+
+def prefix_matches():
+    # Every search the library runs on this CPU, by name.
+    lib = blockchain._library
+    if lib is None:
+        return {}
+
+    return {
+        name: blockchain._prefix_match_function(getattr(lib, f'{name}_prefix_match'))
+        for name in ('sha256ni', 'avx2') if getattr(lib, f'{name}_supported')()
+    }
+
+
+@unittest.skipUnless(prefix_matches(), "sha256ni.so not built or not supported")
+class PrefixMatchTest(unittest.TestCase):
+
+    def test_matches_hashlib(self):
+        # Prefixes across the one and two block boundaries, proofs crossing
+        # a digit count, and counts around the 2 and 8 lane batches. Proofs
+        # come back as int64, so they stay below 1 << 63.
+        starts = [0, 7, 95, 9995, 10**15 - 5, 10**18 - 9]
+        strides = [1, 3, 1000]
+        counts = [0, 1, 2, 3, 8, 9, 17]
+
+        for name, prefix_match in prefix_matches().items():
+            for length in range(131):
+                prefix = (b'1234567890' * 14)[:length]
+                for start in starts:
+                    for stride in strides:
+                        for count in counts:
+                            for target, mask in _MASKS:
+                                args = (prefix, start, stride, count, target, mask)
+                                self.assertEqual(
+                                    prefix_match(prefix, len(prefix), start, stride, count, target, mask),
+                                    first_match(*args), (name, *args))
+
+    def test_finds_proof_of_work(self):
+        for name, prefix_match in prefix_matches().items():
+            for last_proof in (100, 35293):
+                prefix = str(last_proof).encode()
+                target, mask = blockchain._POW_TARGET, blockchain._POW_MASK
+                proof = prefix_match(prefix, len(prefix), 0, 1, 1 << 20, target, mask)
+                self.assertEqual(proof, first_match(prefix, 0, 1, 1 << 20, target, mask), name)
+                self.assertTrue(blockchain.Blockchain.valid_proof(last_proof, proof), name)
+
+
+@unittest.skipIf(blockchain._check_links is None, "sha256ni.so not built or SHA-NI not supported")
+class ValidLinksTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        chain = blockchain.Blockchain(workers=1)
+        for _ in range(6):
+            chain.new_transaction('a', 'b', 1)
+            chain.new_block(chain.proof_of_work(chain.last_block['proof']))
+        cls.blockchain = chain
+        cls.chain = chain.chain
+
+    def assert_links(self, chain, current_index, expected):
+        chain_bytes = [orjson.dumps(block, option=orjson.OPT_SORT_KEYS) for block in chain]
+
+        batched = self.blockchain._valid_links(chain, chain_bytes, current_index)
+        with mock.patch.object(blockchain, '_check_links', None):
+            looped = self.blockchain._valid_links(chain, chain_bytes, current_index)
+
+        self.assertEqual(batched, looped)
+        self.assertEqual(batched, expected)
+
+    def tampered(self, index, key, value):
+        chain = [dict(block) for block in self.chain]
+        chain[index][key] = value
+
+        return chain
+
+    def test_valid_chain(self):
+        for current_index in range(1, len(self.chain)):
+            self.assert_links(self.chain, current_index, True)
+
+    def test_wrong_proof(self):
+        for index in (1, 3, len(self.chain) - 1):
+            self.assert_links(self.tampered(index, 'proof', self.chain[index]['proof'] + 1), 1, False)
+
+    def test_wrong_previous_hash(self):
+        previous_hash = self.chain[4]['previous_hash']
+        self.assert_links(self.tampered(4, 'previous_hash', '0' * 64), 1, False)
+        self.assert_links(self.tampered(4, 'previous_hash', previous_hash.upper()), 1, False)
+        self.assert_links(self.tampered(4, 'previous_hash', previous_hash[:-1]), 1, False)
+
+    def test_proofs_left_to_the_loop(self):
+        # Not plain uint64 ints, so both ways run the per-block loop.
+        proof = self.chain[2]['proof']
+        for value in (float(proof), str(proof), True, -proof):
+            self.assert_links(self.tampered(2, 'proof', value), 1, False)
+
+    def test_largest_proof(self):
+        self.assert_links(self.tampered(2, 'proof', (1 << 64) - 1), 1, False)
+
+
+@unittest.skipIf(_pow_numba is None, "numba not installed")
+class NumbaFindProofTest(unittest.TestCase):
+
+    def test_matches_hashlib(self):
+        for length in (0, 1, 55, 56, 63, 64, 100, 119, 120, 130):
+            prefix = (b'1234567890' * 13)[:length]
+            midstate = _pow_numba.midstate(prefix)
+            for start, count in ((0, 100), (9990, 30), (10**18 - 50, 100)):
+                for target, mask in _MASKS[:3]:
+                    args = (prefix, start, 1, count, target, mask)
+                    self.assertEqual(
+                        _pow_numba.find_proof(prefix, midstate, start, start + count, target, mask),
+                        first_match(*args), args)
+
+    def test_finds_proof_of_work(self):
+        prefix = b'100'
+        target, mask = blockchain._POW_TARGET, blockchain._POW_MASK
+        proof = _pow_numba.find_proof(prefix, _pow_numba.midstate(prefix), 0, 1 << 20, target, mask)
+        self.assertEqual(proof, first_match(prefix, 0, 1, 1 << 20, target, mask))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+"""
+WSGI entry point for running the node under gunicorn:
+
+    gunicorn --workers 1 --worker-class gthread --threads 8 wsgi
+
+Keep to a single worker process. The chain lives in that process's
+memory, so each extra worker would mine a chain of its own; threads
+share it, guarded by Blockchain.lock.
+
+Run as a script, this only starts gunicorn: blockchain is imported in
+the worker, never in the master it forks from, as the Numba and CUDA
+backends cannot be carried across a fork.
+"""
+
+import logging
+import sys
+
+if __name__ == '__main__':
+    from gunicorn.app.wsgiapp import run
+
+    args = sys.argv[1:]
+    # gunicorn adds up --bind options, so only default it when none is given.
+    if not any(arg == '--bind' or arg.startswith(('-b', '--bind=')) for arg in args):
+        args = ['--bind', '127.0.0.1:5000'] + args
+
+    sys.argv = [
+        sys.argv[0],
+        '--workers', '1',
+        '--worker-class', 'gthread',
+        '--threads', '8',
+    ] + args + ['wsgi']
+    run()
+else:
+    from blockchain import app as application, sha256_implementation
+
+    # gunicorn's own error log, shown at info level by default.
+    logging.getLogger('gunicorn.error').info("Using SHA256 implementation: %s", sha256_implementation)